@@ -1,5 +1,12 @@
 BEGIN;
 
+-- ================================
+-- 拡張機能
+-- ================================
+
+-- 部分一致検索(トライグラム)
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
 -- ================================
 -- 型定義
 -- ================================
@@ -83,12 +90,48 @@ COMMENT ON COLUMN products.status IS '製品ステータス';
 COMMENT ON COLUMN products.created_at IS '作成日時';
 COMMENT ON COLUMN products.updated_at IS '更新日時';
 
+-- 製品履歴(価格・在庫)
+-- ※ 追記のみ、products の削除後も製品単位の推移を参照できるよう外部キーは張らない
+-- ※ ブランド、パネル方式での絞り込みは products の現在の分類で行うため持たない
+-- ※ 固定長の列を先に並べて行サイズを詰める
+CREATE TABLE product_history (
+    recorded_at TIMESTAMP WITH TIME ZONE DEFAULT now() NOT NULL,
+    price_jpy INT NOT NULL,
+    stock_quantity INT NOT NULL,
+    product_id VARCHAR(100) NOT NULL
+);
+
+COMMENT ON TABLE product_history IS '製品履歴';
+COMMENT ON COLUMN product_history.recorded_at IS '記録日時';
+COMMENT ON COLUMN product_history.price_jpy IS '価格(円)';
+COMMENT ON COLUMN product_history.stock_quantity IS '在庫数';
+COMMENT ON COLUMN product_history.product_id IS '製品ID';
+
 -- ================================
 -- インデックス定義
 -- ================================
 CREATE INDEX idx_products_brand_id ON products (brand_id);
 CREATE INDEX idx_products_panel_type_id ON products (panel_type_id);
-CREATE INDEX idx_products_status ON products (status);
+
+-- 価格、画面サイズの範囲検索(ステータス指定あり/なし)
+-- ※ status 単独の検索は複合インデックスの先頭列で賄う
+CREATE INDEX idx_products_status_price_jpy ON products (status, price_jpy);
+CREATE INDEX idx_products_status_size_inch ON products (status, size_inch);
+CREATE INDEX idx_products_price_jpy ON products (price_jpy);
+CREATE INDEX idx_products_size_inch ON products (size_inch);
+
+-- 最近登録された商品
+CREATE INDEX idx_products_created_at ON products (created_at DESC);
+
+-- 製品名、製品IDの部分一致検索
+-- ※ product_id の並び替えは主キーのインデックスを使用
+CREATE INDEX idx_products_model_name_trgm ON products USING gin (model_name gin_trgm_ops);
+CREATE INDEX idx_products_product_id_trgm ON products USING gin (product_id gin_trgm_ops);
+
+-- 製品履歴の期間検索
+-- ※ 記録日時順に追記されるため BRIN で十分絞り込める
+CREATE INDEX idx_product_history_recorded_at ON product_history USING brin (recorded_at);
+CREATE INDEX idx_product_history_product_id_recorded_at ON product_history (product_id, recorded_at);
 
 -- ================================
 -- 関数定義
@@ -103,6 +146,233 @@ BEGIN
 END;
 $$ LANGUAGE plpgsql;
 
+-- LIKE のワイルドカードをエスケープ
+CREATE FUNCTION escape_like(p_text TEXT)
+RETURNS TEXT AS $$
+    SELECT replace(replace(replace(p_text, '\', '\\'), '%', '\%'), '_', '\_');
+$$ LANGUAGE sql IMMUTABLE;
+
+-- 製品絞り込み
+-- ※ NULL の条件は無視する
+-- ※ PostgREST から直接呼ぶと引数が定数にならず NULL の条件が残るため、
+--    EXECUTE ... USING の動的SQLから呼び出す(引数が定数として展開され、条件に応じたインデックスが使われる)
+CREATE FUNCTION filter_products(
+    p_query TEXT DEFAULT NULL,
+    p_brand_ids INT[] DEFAULT NULL,
+    p_statuses product_status[] DEFAULT NULL,
+    p_price_min INT DEFAULT NULL,
+    p_price_max INT DEFAULT NULL,
+    p_size_min NUMERIC DEFAULT NULL,
+    p_size_max NUMERIC DEFAULT NULL
+)
+RETURNS SETOF products AS $$
+    SELECT *
+    FROM products p
+    WHERE (
+            p_query IS NULL OR p_query = ''
+            OR p.model_name ILIKE '%' || escape_like(p_query) || '%'
+            OR p.product_id ILIKE '%' || escape_like(p_query) || '%'
+        )
+        AND (p_brand_ids IS NULL OR p.brand_id = ANY (p_brand_ids))
+        AND (p_statuses IS NULL OR p.status = ANY (p_statuses))
+        AND (p_price_min IS NULL OR p.price_jpy >= p_price_min)
+        AND (p_price_max IS NULL OR p.price_jpy <= p_price_max)
+        AND (p_size_min IS NULL OR p.size_inch >= p_size_min)
+        AND (p_size_max IS NULL OR p.size_inch <= p_size_max);
+$$ LANGUAGE sql STABLE;
+
+-- 製品検索(並び替え、ページング)
+-- ※ 動的SQLで実行し、引数の値と並び替え列に応じた実行計画を毎回立てる
+CREATE FUNCTION search_products(
+    p_query TEXT DEFAULT NULL,
+    p_brand_ids INT[] DEFAULT NULL,
+    p_statuses product_status[] DEFAULT NULL,
+    p_price_min INT DEFAULT NULL,
+    p_price_max INT DEFAULT NULL,
+    p_size_min NUMERIC DEFAULT NULL,
+    p_size_max NUMERIC DEFAULT NULL,
+    p_sort TEXT DEFAULT 'product_id',
+    p_desc BOOLEAN DEFAULT FALSE,
+    p_limit INT DEFAULT NULL,
+    p_offset INT DEFAULT 0
+)
+RETURNS SETOF products AS $$
+DECLARE
+    v_direction TEXT := CASE WHEN p_desc THEN 'DESC' ELSE 'ASC' END;
+BEGIN
+    IF p_sort NOT IN (
+        'product_id', 'model_name', 'size_inch', 'refresh_rate', 'price_jpy',
+        'stock_quantity', 'release_date', 'status', 'created_at', 'updated_at'
+    ) THEN
+        RAISE EXCEPTION '並び替えできない列です: %', p_sort;
+    END IF;
+
+    RETURN QUERY EXECUTE format(
+        'SELECT * FROM filter_products($1, $2, $3, $4, $5, $6, $7) p
+         ORDER BY p.%I %s, p.product_id %s
+         LIMIT $8 OFFSET $9',
+        p_sort, v_direction, v_direction
+    )
+    USING p_query, p_brand_ids, p_statuses, p_price_min, p_price_max,
+          p_size_min, p_size_max, p_limit, p_offset;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- 製品件数
+-- ※ search_products と同じく動的SQLで実行する
+CREATE FUNCTION count_products(
+    p_query TEXT DEFAULT NULL,
+    p_brand_ids INT[] DEFAULT NULL,
+    p_statuses product_status[] DEFAULT NULL,
+    p_price_min INT DEFAULT NULL,
+    p_price_max INT DEFAULT NULL,
+    p_size_min NUMERIC DEFAULT NULL,
+    p_size_max NUMERIC DEFAULT NULL
+)
+RETURNS BIGINT AS $$
+DECLARE
+    v_count BIGINT;
+BEGIN
+    EXECUTE 'SELECT count(*) FROM filter_products($1, $2, $3, $4, $5, $6, $7)'
+    INTO v_count
+    USING p_query, p_brand_ids, p_statuses, p_price_min, p_price_max,
+          p_size_min, p_size_max;
+    RETURN v_count;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
+-- 製品の価格、画面サイズの範囲(フィルターの上下限用)
+CREATE FUNCTION get_product_ranges()
+RETURNS TABLE (
+    min_price_jpy INT,
+    max_price_jpy INT,
+    min_size_inch NUMERIC,
+    max_size_inch NUMERIC
+) AS $$
+    SELECT min(price_jpy), max(price_jpy), min(size_inch), max(size_inch)
+    FROM products;
+$$ LANGUAGE sql STABLE;
+
+-- 製品履歴記録
+CREATE FUNCTION record_product_history()
+RETURNS TRIGGER AS $$
+BEGIN
+   INSERT INTO product_history (price_jpy, stock_quantity, product_id)
+   VALUES (NEW.price_jpy, NEW.stock_quantity, NEW.product_id);
+   RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- 製品履歴の推移(期間を p_bucket 単位に集計)
+-- ※ 製品の指定があればその製品(削除済みも可)、なければ products の現在の分類で
+--    ブランド、パネル方式を絞り込んだ製品(指定なしは全製品)が対象
+-- ※ 履歴は変更時のみ記録されるため、製品ごとに期間開始時点の値を起点とし、
+--    集計単位ごとの変化量(前の値との差)の累積和で各単位の合計を求める
+--    (変更のない単位は直前の値が引き継がれる)
+-- ※ 処理量は 対象製品数(期間開始時点の値の索引検索) + 期間内の変更件数 + 集計単位数 に比例し、
+--    対象製品数 x 集計単位数 の表は作らない
+-- ※ 履歴は製品ごとに (product_id, recorded_at) のインデックスで引くため、
+--    (brand_id, recorded_at) のインデックスは不要
+-- ※ 動的SQLで実行し、引数を定数として実行計画を立てる
+CREATE FUNCTION get_product_history_trend(
+    p_start TIMESTAMP WITH TIME ZONE,
+    p_end TIMESTAMP WITH TIME ZONE,
+    p_bucket INTERVAL DEFAULT '1 day',
+    p_product_id VARCHAR DEFAULT NULL,
+    p_brand_id INT DEFAULT NULL,
+    p_panel_type_id INT DEFAULT NULL
+)
+RETURNS TABLE (
+    bucket TIMESTAMP WITH TIME ZONE,
+    avg_price_jpy NUMERIC,
+    total_stock_quantity BIGINT,
+    product_count BIGINT
+) AS $$
+BEGIN
+    RETURN QUERY EXECUTE '
+        WITH targets AS (
+            -- 対象製品
+            SELECT $4::VARCHAR AS product_id
+            WHERE $4 IS NOT NULL
+            UNION ALL
+            SELECT p.product_id
+            FROM products p
+            WHERE $4 IS NULL
+                AND ($5 IS NULL OR p.brand_id = $5)
+                AND ($6 IS NULL OR p.panel_type_id = $6)
+        ),
+        changes AS (
+            -- 期間開始時点の値
+            SELECT t.product_id, $1 AS recorded_at, s.price_jpy, s.stock_quantity
+            FROM targets t
+            CROSS JOIN LATERAL (
+                SELECT h.price_jpy, h.stock_quantity
+                FROM product_history h
+                WHERE h.product_id = t.product_id
+                    AND h.recorded_at < $1
+                ORDER BY h.recorded_at DESC
+                LIMIT 1
+            ) s
+            UNION ALL
+            -- 期間内の変更
+            SELECT h.product_id, h.recorded_at, h.price_jpy, h.stock_quantity
+            FROM targets t
+            JOIN product_history h ON h.product_id = t.product_id
+            WHERE h.recorded_at >= $1
+                AND h.recorded_at < $2
+        ),
+        last_in_bucket AS (
+            -- 製品、集計単位ごとの最終値
+            SELECT DISTINCT ON (c.product_id, date_bin($3, c.recorded_at, $1))
+                c.product_id,
+                date_bin($3, c.recorded_at, $1) AS bucket,
+                c.price_jpy,
+                c.stock_quantity
+            FROM changes c
+            ORDER BY c.product_id, date_bin($3, c.recorded_at, $1), c.recorded_at DESC
+        ),
+        deltas AS (
+            -- 製品ごとの前の値との差(最初の値は製品数に加算)
+            SELECT
+                l.bucket,
+                l.price_jpy - coalesce(lag(l.price_jpy) OVER w, 0) AS price_delta,
+                l.stock_quantity - coalesce(lag(l.stock_quantity) OVER w, 0) AS stock_delta,
+                CASE WHEN lag(l.price_jpy) OVER w IS NULL THEN 1 ELSE 0 END AS count_delta
+            FROM last_in_bucket l
+            WINDOW w AS (PARTITION BY l.product_id ORDER BY l.bucket)
+        ),
+        bucket_deltas AS (
+            SELECT
+                d.bucket,
+                sum(d.price_delta) AS price_delta,
+                sum(d.stock_delta) AS stock_delta,
+                sum(d.count_delta) AS count_delta
+            FROM deltas d
+            GROUP BY d.bucket
+        ),
+        totals AS (
+            -- 変化量の累積和 = 各単位時点の合計
+            SELECT
+                b.bucket,
+                sum(coalesce(d.price_delta, 0)) OVER w AS total_price,
+                sum(coalesce(d.stock_delta, 0)) OVER w AS total_stock,
+                sum(coalesce(d.count_delta, 0)) OVER w AS total_count
+            FROM generate_series($1, $2 - INTERVAL ''1 microsecond'', $3) AS b (bucket)
+            LEFT JOIN bucket_deltas d ON d.bucket = b.bucket
+            WINDOW w AS (ORDER BY b.bucket)
+        )
+        SELECT
+            t.bucket,
+            round(t.total_price / t.total_count),
+            t.total_stock::BIGINT,
+            t.total_count::BIGINT
+        FROM totals t
+        WHERE t.total_count > 0
+        ORDER BY t.bucket'
+    USING p_start, p_end, p_bucket, p_product_id, p_brand_id, p_panel_type_id;
+END;
+$$ LANGUAGE plpgsql STABLE;
+
 -- ================================
 -- トリガー定義
 -- ================================
@@ -125,6 +395,20 @@ BEFORE UPDATE ON products
 FOR EACH ROW
 EXECUTE FUNCTION update_updated_at();
 
+-- 製品履歴(登録時)
+CREATE TRIGGER trg_record_products_history_insert
+AFTER INSERT ON products
+FOR EACH ROW
+EXECUTE FUNCTION record_product_history();
+
+-- 製品履歴(価格・在庫の変更時のみ)
+CREATE TRIGGER trg_record_products_history_update
+AFTER UPDATE OF price_jpy, stock_quantity ON products
+FOR EACH ROW
+WHEN (OLD.price_jpy IS DISTINCT FROM NEW.price_jpy
+    OR OLD.stock_quantity IS DISTINCT FROM NEW.stock_quantity)
+EXECUTE FUNCTION record_product_history();
+
 -- ================================
 -- サンプルマスター登録
 -- ================================
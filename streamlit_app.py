@@ -1,6 +1,7 @@
 # エントリーポイント
 import streamlit as st
 import pandas as pd
+import math
 from io import BytesIO
 from streamlit.components.v1 import html
 from utils import constant
@@ -41,6 +42,7 @@ def put_sidebar():
         st.session_state["page"] = st.sidebar.radio("ページを選択", [
             constant.PAGE_NAME_HOME,
             constant.PAGE_NAME_PRODUCTS_EDITOR,
+            constant.PAGE_NAME_HISTORY,
             constant.PAGE_NAME_IMPORT,
             constant.PAGE_NAME_BRAND_MANAGEMENT,
             constant.PAGE_NAME_PANEL_TYPE_MANAGEMENT
@@ -69,34 +71,34 @@ if auth.has_session():
     # データ表示・編集
     if page == constant.PAGE_NAME_PRODUCTS_EDITOR:
         st.subheader(constant.PAGE_NAME_PRODUCTS_EDITOR)
+
+        # 検索入力(製品ID、製品名の部分一致)
+        query = st.text_input("検索：", "")
+
+        # ブランドフィルター
+        id_by_brand = data_processor.get_id_by_brand()
+        selected_brands = st.sidebar.multiselect("ブランド", list(id_by_brand.keys()))
+
+        # ステータスフィルター
+        selected_status = st.sidebar.multiselect(
+            "ステータス",
+            data_processor.COLUMN_DEFS_PRODUCTS["status"]["allowed"]
+        )
+
+        ranges = {}
         try:
-            # DBからデータ取得
-            res = supabase.table("products").select("*").order("product_id").execute()
+            # DBから価格、画面サイズの範囲を取得
+            ranges = database.get_product_ranges()
         except Exception as e:
             logger.error(e)
             st.error("製品データを取得できませんでした")
 
-        if not res.data:
+        if ranges.get("min_price_jpy") is None:
             st.write("データがありません")
         else:
-            # 取得したデータを表示用に変換
-            df = pd.DataFrame(res.data)
-            data_processor.convert_products_to_edit(df)
-
-            # 検索入力
-            query = st.text_input("検索：", "")
-            if query:
-                df = df[df.apply(lambda row: row.astype(str).str.contains(query, case=False).any(), axis=1)]
-
-            # ブランドフィルター
-            selected_brands = st.sidebar.multiselect("ブランド", df["brand"].unique())
-
-            # ステータスフィルター
-            selected_status = st.sidebar.multiselect("ステータス", df["status"].unique())
-
             # 価格帯フィルター
-            min_price = int(df["price_jpy"].min())
-            max_price = int(df["price_jpy"].max())
+            min_price = int(ranges["min_price_jpy"])
+            max_price = int(ranges["max_price_jpy"])
             if min_price == max_price:
                 min_price = 0
             selected_price = st.sidebar.slider(
@@ -107,8 +109,8 @@ if auth.has_session():
             )
 
             # サイズフィルター
-            min_size = int(df["size_inch"].min())
-            max_size = int(df["size_inch"].max())
+            min_size = int(float(ranges["min_size_inch"]))
+            max_size = math.ceil(float(ranges["max_size_inch"]))
             if min_size == max_size:
                 min_size = 0
             selected_size = st.sidebar.slider(
@@ -118,25 +120,78 @@ if auth.has_session():
                 value=(min_size, max_size)
             )
 
-            # フィルタリング
-            filtered_df = df.copy()
-            if selected_brands:
-                filtered_df = filtered_df[filtered_df["brand"].isin(selected_brands)]
-            if selected_status:
-                filtered_df = filtered_df[filtered_df["status"].isin(selected_status)]
-            filtered_df = filtered_df[
-                (filtered_df["price_jpy"] >= selected_price[0]) & (filtered_df["price_jpy"] <= selected_price[1])
-            ]
-            filtered_df = filtered_df[
-                (filtered_df["size_inch"] >= selected_size[0]) & (filtered_df["size_inch"] <= selected_size[1])
-            ]
+            # 検索条件(DB側で絞り込む)
+            filters = {
+                "query": query,
+                "brand_ids": [id_by_brand[b] for b in selected_brands],
+                "statuses": selected_status,
+                "price_range": selected_price,
+                "size_range": selected_size
+            }
+
+            # 並び替え、表示件数
+            col1, col2, col3 = st.columns(3)
+            sort_col = col1.selectbox("並び替え", constant.PRODUCTS_SORT_COLUMNS)
+            sort_desc = col2.toggle("降順")
+            page_size = col3.selectbox("表示件数", constant.PRODUCTS_PAGE_SIZES)
+
+            total = 0
+            try:
+                # DBから件数取得
+                total = database.count_products(**filters)
+            except Exception as e:
+                logger.error(e)
+                st.error("製品データを取得できませんでした")
+
+            # 検索条件、並び替え、表示件数が変わったら1ページ目に戻す
+            conditions = str((sorted(filters.items(), key=str), sort_col, sort_desc, page_size))
+            if st.session_state.get("products_conditions") != conditions:
+                st.session_state["products_conditions"] = conditions
+                st.session_state["products_page_no"] = 1
+
+            # ページ番号(削除等で範囲外になったら最終ページに戻す)
+            total_pages = max(1, math.ceil(total / page_size))
+            if st.session_state.get("products_page_no", 1) > total_pages:
+                st.session_state["products_page_no"] = total_pages
+            page_no = st.number_input(
+                f"ページ(全 {total_pages} ページ / {total} 件)",
+                min_value=1,
+                max_value=total_pages,
+                step=1,
+                key="products_page_no"
+            )
+
+            data = []
+            try:
+                # DBから表示ページ分のみ取得
+                data = database.search_products(
+                    sort=sort_col,
+                    desc=sort_desc,
+                    limit=page_size,
+                    offset=(page_no - 1) * page_size,
+                    **filters
+                )
+            except Exception as e:
+                logger.error(e)
+                st.error("製品データを取得できませんでした")
+
+            if not data:
+                # 該当なしでも新規登録できるよう空の表を表示
+                df = data_processor.get_empty_products_to_edit()
+            else:
+                # 取得したデータを表示用に変換
+                df = pd.DataFrame(data)
+                data_processor.convert_products_to_edit(df)
+
+            # 表示範囲が変わったら編集内容を引き継がない
+            editor_key = f"products_editor_{hash(conditions)}_{page_no}"
 
             # データ表示
             edited_df = st.data_editor(
-                filtered_df,
+                df,
                 use_container_width=True,
                 num_rows="dynamic",
-                key="products_editor"
+                key=editor_key
             )
 
             # チェックしてエラーを表示
@@ -146,8 +201,8 @@ if auth.has_session():
                 for e in errors:
                     st.error(e)
 
-            # 更新日時は自動更新
-            validated_df.drop(columns=["updated_at"], inplace=True)
+            # 作成日時、更新日時は自動設定
+            validated_df.drop(columns=["created_at", "updated_at"], inplace=True)
 
             # 更新用に変換
             records = validated_df.to_dict(orient="records")
@@ -156,14 +211,34 @@ if auth.has_session():
             records = data_processor.cast_products_to_int(records)
 
             if len(errors) == 0:
+                # Excel作成(検索結果全件)
+                excel_key = conditions
+                if st.button("Excel作成"):
+                    try:
+                        # 取得件数の上限を超えないよう分割して取得
+                        excel_df = pd.DataFrame(database.search_products_all(
+                            sort=sort_col,
+                            desc=sort_desc,
+                            **filters
+                        ))
+                        data_processor.convert_products_to_edit(excel_df)
+                        st.session_state["products_excel"] = {
+                            "key": excel_key,
+                            "data": data_processor.to_excel_bytes(excel_df)
+                        }
+                    except Exception as e:
+                        logger.error(e)
+                        st.error(f"Excelを作成できませんでした  \n{e}")
+
                 # Excelダウンロード
-                excel_bytes = data_processor.to_excel_bytes(edited_df)
-                st.download_button(
-                    label="Excelダウンロード",
-                    data=excel_bytes,
-                    file_name="products.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+                products_excel = st.session_state.get("products_excel")
+                if products_excel is not None and products_excel["key"] == excel_key:
+                    st.download_button(
+                        label="Excelダウンロード",
+                        data=products_excel["data"],
+                        file_name="products.xlsx",
+                        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                    )
 
             if records:
                 # 登録/更新の保存
@@ -179,11 +254,10 @@ if auth.has_session():
                             logger.error(e)
                             st.error(f"保存できませんでした  \n{e}")
 
-            # 削除対象を取得
-            db_ids = supabase.table("products").select("product_id").execute()
-            db_ids = [row["product_id"] for row in db_ids.data]
-            df_ids = [row["product_id"] for row in records]
-            ids_to_delete = list(set(db_ids) - set(df_ids))
+            # 削除対象を取得(表示ページ内で行が消えた製品)
+            page_ids = df["product_id"].tolist()
+            edited_ids = [row["product_id"] for row in records]
+            ids_to_delete = list(set(page_ids) - set(edited_ids))
             delete_len = len(ids_to_delete)
 
             # 削除の保存
@@ -198,6 +272,69 @@ if auth.has_session():
                         st.error(f"保存できませんでした  \n{e}")
                 st.write(f"**※ {delete_len} 件が削除されます**")
 
+    # 価格・在庫推移
+    elif page == constant.PAGE_NAME_HISTORY:
+        st.subheader(constant.PAGE_NAME_HISTORY)
+
+        # 集計対象
+        target = st.radio("対象", ["全製品", "製品", "ブランド", "パネル方式"], horizontal=True)
+        product_id = None
+        brand_id = None
+        panel_type_id = None
+        if target == "製品":
+            product_id = st.text_input("製品ID")
+        elif target == "ブランド":
+            id_by_brand = data_processor.get_id_by_brand()
+            brand = st.selectbox("ブランド", list(id_by_brand.keys()))
+            brand_id = id_by_brand.get(brand)
+        elif target == "パネル方式":
+            id_by_panel_type = data_processor.get_id_by_panel_type()
+            panel_type = st.selectbox("パネル方式", list(id_by_panel_type.keys()))
+            panel_type_id = id_by_panel_type.get(panel_type)
+
+        # 期間
+        today = pd.Timestamp.now(tz="Asia/Tokyo").normalize()
+        selected_period = st.date_input(
+            "期間",
+            value=((today - pd.Timedelta(days=30)).date(), today.date())
+        )
+
+        if target == "製品" and not product_id:
+            st.info("製品IDを入力してください")
+        elif len(selected_period) == 2:
+            # 終了日は当日を含める
+            start = pd.Timestamp(selected_period[0], tz="Asia/Tokyo")
+            end = pd.Timestamp(selected_period[1], tz="Asia/Tokyo") + pd.Timedelta(days=1)
+            bucket = data_processor.get_history_bucket(start, end)
+
+            data = []
+            try:
+                # DBから集計済みの推移を取得
+                data = database.get_product_history_trend(
+                    start.isoformat(),
+                    end.isoformat(),
+                    bucket,
+                    product_id=product_id,
+                    brand_id=brand_id,
+                    panel_type_id=panel_type_id
+                )
+            except Exception as e:
+                logger.error(e)
+                st.error("履歴データを取得できませんでした")
+
+            if not data:
+                st.write("データがありません")
+            else:
+                df = pd.DataFrame(data)
+                df["bucket"] = pd.to_datetime(df["bucket"], utc=True).dt.tz_convert("Asia/Tokyo")
+                df = df.set_index("bucket")
+
+                st.caption(f"集計単位：{bucket}")
+                st.write("価格(平均)")
+                st.line_chart(df[["avg_price_jpy"]])
+                st.write("在庫数(合計)")
+                st.line_chart(df[["total_stock_quantity"]])
+
     # CSVインポート
     elif page == constant.PAGE_NAME_IMPORT:
         st.subheader(constant.PAGE_NAME_IMPORT)
@@ -211,7 +348,7 @@ if auth.has_session():
                 st.session_state["uploaded_filename"] = uploaded_file.name
                 st.session_state["uploaded_df"] = df
             except Exception as e:
-                logger.error(f"{e} file:{uploaded_file.name}")
+                logger.error(e, extra={"file": uploaded_file.name})
                 st.error(f"{uploaded_file.name}を読み込めませんでした  \nファイルの内容を確認してください")
 
             # 確認/編集画面表示
@@ -369,7 +506,7 @@ else:
                 if is_success:
                     st.rerun()
                 else:
-                    logger.error(f"email: {input_email}, password: {input_password}")
+                    logger.error("ログイン失敗", extra={"email": input_email})
                     st.error("ログインできません  \nメールアドレス、パスワードを確認してください")
 
 # フッター表示
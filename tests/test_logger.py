@@ -0,0 +1,153 @@
+# ログのマスク処理テスト
+
+import json
+import logging
+import sys
+
+import pytest
+from utils.logger import (
+    JsonFormatter,
+    NonBlockingQueueHandler,
+    SamplingFilter,
+    is_redact_key,
+    redact_text,
+    redact_value,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("password:pw", "password:***"),
+    ("email:a@b password: pw", "email:a@b password: ***"),
+    ("api_key=k1, user=u", "api_key=***, user=u"),
+    ('{"password": "pw"}', '{"password": "***"}'),
+    ("{'api_key': 'k'}", "{'api_key': '***'}"),
+    ("Authorization: Bearer abc", "Authorization: ***"),
+    ("url=https://x.supabase.co?apikey=SECRET&x=1", "url=https://x.supabase.co?apikey=***&x=1"),
+    ("accesstoken: t", "accesstoken: ***"),
+    ("header Bearer abc", "header Bearer ***"),
+])
+def test_redact_text_masks_credentials(text, expected):
+    assert redact_text(text) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "monkey: banana",
+    "keyboard=qwerty",
+    "keyword: monitor",
+    "status: active",
+])
+def test_redact_text_keeps_non_credentials(text):
+    assert redact_text(text) == text
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("password", True),
+    ("api_key", True),
+    ("SUPABASE_KEY", True),
+    ("accessToken", True),
+    ("apikey", True),
+    ("accesstoken", True),
+    ("privatekey", True),
+    ("keyword", False),
+    ("monkey", False),
+    ("email", False),
+])
+def test_is_redact_key(name, expected):
+    assert is_redact_key(name) is expected
+
+
+def test_redact_value_nested():
+    value = {"email": "a@b", "auth": {"password": "pw"}, "notes": ["token=t"]}
+    assert redact_value(value) == {
+        "email": "a@b",
+        "auth": {"password": "***"},
+        "notes": ["token=***"],
+    }
+
+
+def make_record(msg="hello", args=None, level=logging.INFO, **extra):
+    record = logging.makeLogRecord({
+        "name": "test",
+        "msg": msg,
+        "args": args,
+        "levelno": level,
+        "levelname": logging.getLevelName(level),
+    })
+    record.__dict__.update(extra)
+    return record
+
+
+def test_prepare_freezes_args():
+    values = ["before"]
+    record = make_record("value %s", (values,))
+    prepared = NonBlockingQueueHandler(None).prepare(record)
+    values.append("after")
+
+    assert prepared.msg == "value ['before']"
+    assert prepared.args is None
+    assert record.args == (values,)
+
+
+def test_prepare_formats_exc_info():
+    try:
+        1 / 0
+    except ZeroDivisionError:
+        record = make_record(exc_info=sys.exc_info())
+    prepared = NonBlockingQueueHandler(None).prepare(record)
+
+    assert prepared.exc_info is None
+    assert "ZeroDivisionError" in prepared.exc_text
+
+
+def test_json_formatter_fields():
+    record = make_record("login %s", ("failed",), session_id="s1", page="home", email="a@b")
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "test"
+    assert entry["message"] == "login failed"
+    assert entry["session_id"] == "s1"
+    assert entry["page"] == "home"
+    assert entry["email"] == "a@b"
+    assert "timestamp" in entry
+
+
+def test_json_formatter_redacts_extra():
+    record = make_record(
+        "password: pw",
+        password="pw",
+        apikey="k",
+        cfg={"access_token": "t", "url": "x"},
+        sample_rate=0.5,
+    )
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "password: ***"
+    assert entry["password"] == "***"
+    assert entry["apikey"] == "***"
+    assert entry["cfg"] == {"access_token": "***", "url": "x"}
+    assert "sample_rate" not in entry
+
+
+def test_json_formatter_exc_text():
+    record = make_record(exc_text="Traceback ... token=abc")
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["exc_info"] == "Traceback ... token=***"
+
+
+@pytest.mark.parametrize("rate, expected", [(0.0, False), (1.0, True)])
+def test_sampling_filter_level_rate(rate, expected):
+    sampling = SamplingFilter({logging.INFO: rate})
+    assert all(sampling.filter(make_record()) is expected for _ in range(20))
+
+
+def test_sampling_filter_default_keeps_other_levels():
+    sampling = SamplingFilter({logging.INFO: 0.0})
+    assert sampling.filter(make_record(level=logging.ERROR)) is True
+
+
+@pytest.mark.parametrize("rate, expected", [(0.0, False), (1.0, True)])
+def test_sampling_filter_per_call_rate(rate, expected):
+    sampling = SamplingFilter({logging.INFO: 1.0 - rate})
+    assert all(sampling.filter(make_record(sample_rate=rate)) is expected for _ in range(20))
@@ -24,7 +24,7 @@ def login(email: str, password: str):
             "password": password
         })
     except Exception as e:
-        logger.error(f"{e} email:{email} password:{password}")
+        logger.error(e, extra={"email": email})
         return False
 
     if "error" in res:
@@ -5,3 +5,21 @@ PAGE_NAME_PRODUCTS_EDITOR = "データ編集"
 PAGE_NAME_IMPORT = "データインポート"
 PAGE_NAME_BRAND_MANAGEMENT = "ブランド管理"
 PAGE_NAME_PANEL_TYPE_MANAGEMENT = "パネル方式管理"
+PAGE_NAME_HISTORY = "価格・在庫推移"
+
+# データ編集の表示件数
+PRODUCTS_PAGE_SIZES = [50, 100, 200]
+
+# データ編集の並び替え列
+PRODUCTS_SORT_COLUMNS = [
+    "product_id",
+    "model_name",
+    "size_inch",
+    "refresh_rate",
+    "price_jpy",
+    "stock_quantity",
+    "release_date",
+    "status",
+    "created_at",
+    "updated_at"
+]
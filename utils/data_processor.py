@@ -248,13 +248,34 @@ def convert_products_to_edit(df: pd.DataFrame):
     convert_id_to_panel_type(df)
     concat_resolution_all(df)
 
+# 編集用の空の製品データを作成(列は convert_products_to_edit 後と同じ)
+def get_empty_products_to_edit() -> pd.DataFrame:
+    return pd.DataFrame({
+        "product_id": pd.Series(dtype="object"),
+        "model_name": pd.Series(dtype="object"),
+        "size_inch": pd.Series(dtype="float64"),
+        "refresh_rate": pd.Series(dtype="float64"),
+        "price_jpy": pd.Series(dtype="float64"),
+        "stock_quantity": pd.Series(dtype="float64"),
+        "release_date": pd.Series(dtype="object"),
+        "status": pd.Series(dtype="object"),
+        "created_at": pd.Series(dtype="object"),
+        "updated_at": pd.Series(dtype="object"),
+        "brand": pd.Series(dtype="object"),
+        "panel_type": pd.Series(dtype="object"),
+        "resolution": pd.Series(dtype="object")
+    })
+
 # 製品データの値をintに型変換
 def cast_products_to_int(records: list[dict]) -> list[dict]:
     return cast_records_to_int(records, [
         "brand_id",
         "panel_type_id",
         "resolution_w",
-        "resolution_h"
+        "resolution_h",
+        "refresh_rate",
+        "price_jpy",
+        "stock_quantity"
     ])
 
 # 指定列の値をintに型変換
@@ -281,3 +302,17 @@ def to_excel_bytes(df: pd.DataFrame) -> bytes:
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
         df.to_excel(writer, index=False, sheet_name="Sheet1")
     return output.getvalue()
+
+# 履歴の集計単位を期間から決める(表示点数が max_points 以下になる単位)
+def get_history_bucket(start, end, max_points: int = 200) -> str:
+    seconds = (pd.Timestamp(end) - pd.Timestamp(start)).total_seconds()
+    for bucket, bucket_seconds in [
+        ("1 hour", 3600),
+        ("6 hours", 6 * 3600),
+        ("1 day", 86400),
+        ("7 days", 7 * 86400),
+        ("30 days", 30 * 86400),
+    ]:
+        if seconds / bucket_seconds <= max_points:
+            return bucket
+    return f"{math.ceil(seconds / 86400 / max_points)} days"
@@ -20,5 +20,97 @@ def get_supabase_client():
         client = create_client(supabase_url, supabase_key)
         return client
     except Exception as e:
-        logger.error(f"{e} url:{supabase_url} key:{supabase_key}")
+        logger.error(e, extra={"url": supabase_url})
         return None
+
+# 製品検索条件をDB関数の引数に変換
+# ※ None の条件は無視される
+def build_product_filter_params(
+    query: str = None,
+    brand_ids: list[int] = None,
+    statuses: list[str] = None,
+    price_range: tuple = None,
+    size_range: tuple = None
+) -> dict:
+    return {
+        "p_query": query or None,
+        "p_brand_ids": brand_ids or None,
+        "p_statuses": statuses or None,
+        "p_price_min": price_range[0] if price_range else None,
+        "p_price_max": price_range[1] if price_range else None,
+        "p_size_min": size_range[0] if size_range else None,
+        "p_size_max": size_range[1] if size_range else None
+    }
+
+# 製品検索(DB関数 search_products を呼び出す)
+# ※ filters は build_product_filter_params の引数
+def search_products(
+    sort: str = "product_id",
+    desc: bool = False,
+    limit: int = None,
+    offset: int = 0,
+    **filters
+) -> list[dict]:
+    params = build_product_filter_params(**filters)
+    params.update({
+        "p_sort": sort,
+        "p_desc": desc,
+        "p_limit": limit,
+        "p_offset": offset
+    })
+    res = get_supabase_client().rpc("search_products", params).execute()
+    return res.data
+
+# 製品検索(全件)
+# ※ PostgREST の取得件数上限(max-rows)で切り捨てられないよう chunk_size 件ずつ取得する
+def search_products_all(
+    sort: str = "product_id",
+    desc: bool = False,
+    chunk_size: int = 1000,
+    **filters
+) -> list[dict]:
+    data = []
+    while True:
+        chunk = search_products(
+            sort=sort,
+            desc=desc,
+            limit=chunk_size,
+            offset=len(data),
+            **filters
+        )
+        # 上限が chunk_size より小さい場合もあるため、空になるまで取得する
+        if not chunk:
+            return data
+        data.extend(chunk)
+
+# 製品件数取得(DB関数 count_products を呼び出す)
+def count_products(**filters) -> int:
+    params = build_product_filter_params(**filters)
+    res = get_supabase_client().rpc("count_products", params).execute()
+    return res.data or 0
+
+# 製品の価格、画面サイズの範囲取得(DB関数 get_product_ranges を呼び出す)
+def get_product_ranges() -> dict:
+    res = get_supabase_client().rpc("get_product_ranges", {}).execute()
+    return res.data[0] if res.data else {}
+
+# 製品履歴の推移取得(DB関数 get_product_history_trend を呼び出す)
+# ※ bucket は PostgreSQL の interval 形式("1 day" 等)
+def get_product_history_trend(
+    start: str,
+    end: str,
+    bucket: str = "1 day",
+    product_id: str = None,
+    brand_id: int = None,
+    panel_type_id: int = None
+) -> list[dict]:
+    params = {
+        "p_start": start,
+        "p_end": end,
+        "p_bucket": bucket,
+        "p_product_id": product_id,
+        "p_brand_id": brand_id,
+        "p_panel_type_id": panel_type_id
+    }
+    res = get_supabase_client().rpc("get_product_history_trend", params).execute()
+    return res.data
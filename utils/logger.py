@@ -1,13 +1,198 @@
 # ログ処理
+import atexit
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
+from datetime import datetime, timezone
+
+# ログレベル
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# レベル別サンプリング率(未指定のレベルは全件出力)
+LOG_SAMPLE_RATES = {
+    logging.DEBUG: float(os.environ.get("LOG_SAMPLE_RATE_DEBUG", "0.1")),
+    logging.INFO: float(os.environ.get("LOG_SAMPLE_RATE_INFO", "1.0")),
+}
+
+# マスク対象のキー(キー名を "_" "-" 等で区切った語と一致したらマスク)
+REDACT_KEYS = ("password", "passwd", "secret", "token", "key", "authorization")
+REDACT_MASK = "***"
+
+# 区切りなしで連結されることが多い接頭辞("apikey" "accesstoken" 等)
+REDACT_KEY_PREFIXES = ("api", "access", "refresh", "private", "secret", "client", "session", "auth")
+
+# マスク対象の語
+REDACT_WORDS = set(REDACT_KEYS) | {p + k for p in REDACT_KEY_PREFIXES for k in REDACT_KEYS}
+
+_REDACT_KEY_NAME = (
+    r"(?:[a-z0-9]+[_-])*(?:"
+    + "|".join(sorted(REDACT_WORDS, key=len, reverse=True))
+    + r")(?:[_-][a-z0-9]+)*"
+)
+
+# メッセージ内の "password:xxx" "key=xxx" "'api_key': 'xxx'" 等をマスク
+# ※ "Authorization: Bearer xxx" はスキームごと値をマスク
+_REDACT_PATTERN = re.compile(
+    r"(?i)(?P<kq>[\"']?)\b(?P<key>" + _REDACT_KEY_NAME + r")\b(?P=kq)"
+    r"(?P<sep>\s*[:=]\s*)"
+    r"(?P<value>\"[^\"]*\"|'[^']*'|(?:(?:bearer|basic)\s+)?[^\s,;&'\"}\]]+)"
+)
+
+# キーなしの "Bearer xxx" をマスク
+_BEARER_PATTERN = re.compile(r"(?i)\b(bearer)\s+[^\s,;'\"}\]]+")
+
+# LogRecord標準属性(extraの判定用)
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+# キュー、リスナー(プロセスで1つ)
+_queue = None
+_listener = None
+_lock = threading.Lock()
+
+# マスク対象のキーかを返す
+def is_redact_key(name: str) -> bool:
+    # camelCase も区切る
+    name = re.sub(r"([a-z0-9])([A-Z])", r"\1_\2", name).lower()
+    return any(word in REDACT_WORDS for word in re.split(r"[\W_]+", name))
+
+# 値をマスク(引用符は残す)
+def _mask_value(value: str) -> str:
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in "\"'":
+        return f"{value[0]}{REDACT_MASK}{value[0]}"
+    return REDACT_MASK
+
+# 文字列中の認証情報をマスク
+def redact_text(text: str) -> str:
+    text = _REDACT_PATTERN.sub(
+        lambda m: f"{m.group('kq')}{m.group('key')}{m.group('kq')}{m.group('sep')}{_mask_value(m.group('value'))}",
+        text
+    )
+    return _BEARER_PATTERN.sub(lambda m: f"{m.group(1)} {REDACT_MASK}", text)
+
+# 値の認証情報をマスク
+def redact_value(value):
+    if isinstance(value, dict):
+        return {
+            k: REDACT_MASK if is_redact_key(str(k)) else redact_value(v)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact_value(v) for v in value]
+    if isinstance(value, str):
+        return redact_text(value)
+    return value
+
+# セッションID、表示ページを付与するフィルター(呼び出し元スレッドで実行)
+class ContextFilter(logging.Filter):
+    def filter(self, record):
+        record.session_id = None
+        record.page = None
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+            ctx = get_script_run_ctx()
+        except Exception:
+            ctx = None
+
+        # スクリプトスレッド外ではセッションに触らない
+        if ctx is not None:
+            record.session_id = ctx.session_id
+            try:
+                record.page = ctx.session_state["page"]
+            except Exception:
+                pass
+        return True
+
+# レベル別サンプリングフィルター
+# extra={"sample_rate": 0.01} で呼び出し単位の指定も可能
+class SamplingFilter(logging.Filter):
+    def __init__(self, rates: dict = None):
+        super().__init__()
+        self.rates = LOG_SAMPLE_RATES if rates is None else rates
+
+    def filter(self, record):
+        rate = getattr(record, "sample_rate", None)
+        if rate is None:
+            rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        return random.random() < rate
+
+# JSON形式のフォーマッター(リスナースレッドで実行)
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact_text(record.getMessage()),
+            "session_id": getattr(record, "session_id", None),
+            "page": getattr(record, "page", None),
+        }
+
+        # extraで渡された項目
+        for k, v in record.__dict__.items():
+            if k in _RECORD_ATTRS or k in entry or k == "sample_rate":
+                continue
+            entry[k] = REDACT_MASK if is_redact_key(k) else redact_value(v)
+
+        if record.exc_text:
+            entry["exc_info"] = redact_text(record.exc_text)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+# キューへの投入のみ行うハンドラー
+# 整形はリスナースレッドに任せ、呼び出し元では最低限の処理に留める
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+
+        # 引数は呼び出し時点の値で確定させる
+        record.msg = record.getMessage()
+        record.args = None
+
+        # 例外情報はトレースバックを文字列化して破棄
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+# リスナー停止(未出力のログを書き切る)
+def shutdown():
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+# キューとリスナーを返す
+def get_queue():
+    global _queue, _listener
+    with _lock:
+        if _listener is None:
+            _queue = queue.SimpleQueue()
+
+            handler = logging.StreamHandler()
+            handler.setFormatter(JsonFormatter())
+
+            _listener = logging.handlers.QueueListener(
+                _queue, handler, respect_handler_level=True
+            )
+            _listener.start()
+            atexit.register(shutdown)
+    return _queue
 
 def get_logger(name=__name__):
     logger = logging.getLogger(name)
     if not logger.hasHandlers():
-        logger.setLevel(logging.INFO)
+        logger.setLevel(LOG_LEVEL)
 
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter('%(asctime)s [%(levelname)s] %(message)s')
-        handler.setFormatter(formatter)
+        handler = NonBlockingQueueHandler(get_queue())
+        handler.addFilter(SamplingFilter())
+        handler.addFilter(ContextFilter())
         logger.addHandler(handler)
     return logger